@@ -6,9 +6,22 @@ This module implements a cache manager with common caching strategies
 to avoid "cowboy coding" practices in cache management.
 """
 
+import functools
+import logging
+import os
+import sys
+import threading
 import time
-from typing import Any, Optional, Callable
-from collections import OrderedDict
+from collections import deque
+from typing import Any, Optional, Callable, Iterable, Mapping
+
+_log = logging.getLogger(__name__)
+
+# Sentinel distinguishing a cache miss from a cached None value
+_MISS = object()
+
+# Artificial delay in seconds added to search_sand_dunes (off by default)
+_SIMULATE_LATENCY = float(os.environ.get('DUNE_SEARCH_LATENCY', '0'))
 
 
 class CacheManager:
@@ -22,6 +35,13 @@ class CacheManager:
     4. Return result
     """
     
+    # No per-instance __dict__; attribute access uses fixed slot offsets
+    __slots__ = (
+        'max_size', '_default_ttl', '_cache', '_counters',
+        '_default_ttl_ns', '_now', '_min_expiry', '_next_purge',
+        '_free_entries',
+    )
+    
     def __init__(self, max_size: int = 100, default_ttl: int = 300):
         """
         Initialize the cache manager.
@@ -31,36 +51,72 @@ class CacheManager:
             default_ttl: Default time-to-live in seconds for cached items
         """
         self.max_size = max_size
+        # Each entry is stored as a [value, expires_at] list; plain dicts
+        # preserve insertion order, so the first key is the least recently used
+        self._cache = dict.fromkeys(range(max_size))
+        # Deleting the placeholders (unlike clear()) keeps the table sized for
+        # max_size entries, so warmup inserts don't trigger repeated resizes
+        for i in range(max_size):
+            del self._cache[i]
+        # [misses, hits], indexed by whether a lookup found its key
+        self._counters = [0, 0]
+        # Bound once to skip the global/attribute lookup on every call
+        self._now = time.monotonic_ns
+        # Earliest expiry of any entry; until it passes no entry can be stale
+        self._min_expiry = float('inf')
+        # Full expiry scans run at most once per default_ttl window; between
+        # scans, entries are checked individually as they are looked up
+        self._next_purge = 0
+        # Entry lists released by delete/clear/expiry, reused by set to avoid
+        # allocating a new list per insert
+        self._free_entries = deque(maxlen=max_size)
         self.default_ttl = default_ttl
-        self._cache = OrderedDict()
-        self._timestamps = {}
-        self._hits = 0
-        self._misses = 0
     
-    def get(self, key: str) -> Optional[Any]:
+    @property
+    def default_ttl(self) -> int:
+        """Default time-to-live in seconds for cached items."""
+        return self._default_ttl
+    
+    @default_ttl.setter
+    def default_ttl(self, value: int) -> None:
+        self._default_ttl = value
+        # Expiry is tracked as integer monotonic nanoseconds, which are cheap to
+        # compare and unaffected by wall-clock adjustments
+        self._default_ttl_ns = value * 1_000_000_000
+        # The purge window is derived from the old TTL; allow a scan right away
+        self._next_purge = 0
+    
+    def get(self, key: str, default: Any = None) -> Optional[Any]:
         """
         Get value from cache if it exists and is not expired.
         
         Args:
             key: Cache key
+            default: Value to return on a miss
             
         Returns:
-            Cached value or None if not found or expired
+            Cached value or default if not found or expired
         """
-        if key not in self._cache:
-            self._misses += 1
-            return None
+        # Per-entry TTL checks are only needed once the earliest expiry passes
+        now = self._now()
+        stale = now > self._min_expiry
+        if stale and now >= self._next_purge:
+            self._purge_expired(now)
+            stale = False
         
-        # Check if expired
-        if self._is_expired(key):
-            self.delete(key)
-            self._misses += 1
-            return None
+        entry = self._cache.get(key)
+        if stale and entry is not None and now > entry[1]:
+            # Expired but not yet purged
+            del self._cache[key]
+            self._release(entry)
+            entry = None
+        self._counters[entry is not None] += 1
+        if entry is None:
+            return default
         
-        # Move to end to mark as recently used (LRU)
-        self._cache.move_to_end(key)
-        self._hits += 1
-        return self._cache[key]
+        # Reinsert to mark as recently used (LRU)
+        self._cache[key] = self._cache.pop(key)
+        return entry[0]
     
     def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
         """
@@ -71,14 +127,78 @@ class CacheManager:
             value: Value to cache
             ttl: Time-to-live in seconds (uses default_ttl if not specified)
         """
-        # Evict oldest item if at capacity
-        if key not in self._cache and len(self._cache) >= self.max_size:
-            evicted_key, _ = self._cache.popitem(last=False)
-            del self._timestamps[evicted_key]
+        cache = self._cache
+        
+        # Removing an existing key lets the reinsert below move it to the end
+        entry = cache.pop(key, None)
+        if entry is None:
+            if len(cache) >= self.max_size:
+                # Evict oldest item and reuse its entry for the new key
+                entry = cache.pop(next(iter(cache)))
+            elif self._free_entries:
+                entry = self._free_entries.pop()
+            else:
+                entry = [None, 0]
+        
+        ttl_ns = ttl * 1_000_000_000 if ttl else self._default_ttl_ns
+        expires_at = self._now() + ttl_ns
+        entry[0] = value
+        entry[1] = expires_at
+        cache[key] = entry
+        if expires_at < self._min_expiry:
+            self._min_expiry = expires_at
+    
+    def get_many(self, keys: Iterable[str]) -> dict:
+        """
+        Get several values from cache in one call.
+        
+        Args:
+            keys: Cache keys to look up
+            
+        Returns:
+            Dictionary mapping each found key to its cached value; keys that
+            are missing or expired are omitted
+        """
+        now = self._now()
+        stale = now > self._min_expiry
+        if stale and now >= self._next_purge:
+            self._purge_expired(now)
+            stale = False
+        
+        cache = self._cache
+        found = {}
+        lookups = 0
+        hits = 0
+        for key in keys:
+            lookups += 1
+            entry = cache.get(key)
+            if entry is None:
+                continue
+            if stale and now > entry[1]:
+                # Expired but not yet purged
+                del cache[key]
+                self._release(entry)
+                continue
+            # Reinsert to mark as recently used (LRU)
+            cache[key] = cache.pop(key)
+            found[key] = entry[0]
+            hits += 1
+        
+        self._counters[0] += lookups - hits
+        self._counters[1] += hits
+        return found
+    
+    def set_many(self, items: Mapping[str, Any], ttl: Optional[int] = None) -> None:
+        """
+        Set several values in cache with the same optional TTL.
         
-        self._cache[key] = value
-        self._cache.move_to_end(key)
-        self._timestamps[key] = time.time() + (ttl or self.default_ttl)
+        Args:
+            items: Mapping of cache keys to values
+            ttl: Time-to-live in seconds (uses default_ttl if not specified)
+        """
+        set_ = self.set
+        for key, value in items.items():
+            set_(key, value, ttl)
     
     def delete(self, key: str) -> None:
         """
@@ -87,41 +207,251 @@ class CacheManager:
         Args:
             key: Cache key to delete
         """
-        if key in self._cache:
-            del self._cache[key]
-            del self._timestamps[key]
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._release(entry)
     
     def clear(self) -> None:
         """Clear all cache entries."""
+        for entry in self._cache.values():
+            self._release(entry)
         self._cache.clear()
-        self._timestamps.clear()
-        self._hits = 0
-        self._misses = 0
+        self._counters = [0, 0]
+        self._min_expiry = float('inf')
+        self._next_purge = 0
+    
+    def __len__(self) -> int:
+        """Number of stored entries, including expired ones not yet purged."""
+        return len(self._cache)
+    
+    def __contains__(self, key: str) -> bool:
+        """Check if key is cached and unexpired without touching LRU or stats."""
+        entry = self._cache.get(key)
+        return entry is not None and self._now() <= entry[1]
+    
+    def __getitem__(self, key: str) -> Any:
+        """Get value like get(), raising KeyError if not found or expired."""
+        value = self.get(key, _MISS)
+        if value is _MISS:
+            raise KeyError(key)
+        return value
     
-    def _is_expired(self, key: str) -> bool:
-        """Check if cache entry has expired."""
-        return time.time() > self._timestamps.get(key, 0)
+    def _purge_expired(self, now: int) -> None:
+        """
+        Remove all expired entries and recompute the earliest expiry.
+        
+        Scans the whole cache, so it is rate-limited to once per default_ttl.
+        """
+        cache = self._cache
+        expired = [key for key, (_, expires_at) in cache.items() if now > expires_at]
+        for key in expired:
+            self._release(cache.pop(key))
+        self._min_expiry = min(
+            (expires_at for _, expires_at in cache.values()), default=float('inf')
+        )
+        self._next_purge = now + self._default_ttl_ns
+    
+    def _release(self, entry: list) -> None:
+        """Return a removed entry to the free list for reuse."""
+        entry[0] = None
+        self._free_entries.append(entry)
     
     def get_stats(self) -> dict:
         """
         Get cache statistics.
         
         Returns:
-            Dictionary with cache stats including hits, misses, and hit rate
+            Dictionary with cache stats including hits, misses, and hit rate.
+            hit_rate is a percentage and hit_rate_bp the same rate in integer
+            basis points; formatting is left to the caller.
         """
-        total = self._hits + self._misses
-        hit_rate = (self._hits / total * 100) if total > 0 else 0
+        misses, hits = self._counters
+        total = hits + misses
         
         return {
-            'hits': self._hits,
-            'misses': self._misses,
+            'hits': hits,
+            'misses': misses,
             'total_requests': total,
-            'hit_rate': f"{hit_rate:.2f}%",
+            'hit_rate': (hits / total * 100) if total > 0 else 0.0,
+            'hit_rate_bp': (hits * 10000) // total if total > 0 else 0,
             'size': len(self._cache),
             'max_size': self.max_size
         }
 
 
+class ShardedCacheManager:
+    """
+    A cache manager that splits keys across independently locked shards.
+    
+    Each key is routed by hash to one of several CacheManager shards, each
+    guarded by its own lock, so concurrent callers only contend when their
+    keys land on the same shard. LRU eviction and TTL expiry apply per shard.
+    """
+    
+    __slots__ = ('_shards', '_locks', '_mask')
+    
+    def __init__(self, max_size: int = 100, default_ttl: int = 300,
+                 shards: int = 16):
+        """
+        Initialize the sharded cache manager.
+        
+        Args:
+            max_size: Maximum number of items to store across all shards;
+                must be at least the number of shards
+            default_ttl: Default time-to-live in seconds for cached items
+            shards: Number of shards; must be a power of two
+        """
+        if shards < 1 or shards & (shards - 1):
+            raise ValueError(f"shards must be a power of two, got {shards}")
+        if max_size < shards:
+            raise ValueError(
+                f"max_size ({max_size}) must be at least shards ({shards})"
+            )
+        
+        # Spread the remainder so total capacity is exactly max_size
+        base, extra = divmod(max_size, shards)
+        self._shards = [
+            CacheManager(base + (i < extra), default_ttl) for i in range(shards)
+        ]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._mask = shards - 1
+    
+    def get(self, key: str, default: Any = None) -> Optional[Any]:
+        """
+        Get value from cache if it exists and is not expired.
+        
+        Args:
+            key: Cache key
+            default: Value to return on a miss
+            
+        Returns:
+            Cached value or default if not found or expired
+        """
+        i = hash(key) & self._mask
+        with self._locks[i]:
+            return self._shards[i].get(key, default)
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """
+        Set value in cache with optional TTL.
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl: Time-to-live in seconds (uses default_ttl if not specified)
+        """
+        i = hash(key) & self._mask
+        with self._locks[i]:
+            self._shards[i].set(key, value, ttl)
+    
+    def get_many(self, keys: Iterable[str]) -> dict:
+        """
+        Get several values from cache in one call.
+        
+        Keys are grouped by shard so each shard's lock is taken once.
+        
+        Args:
+            keys: Cache keys to look up
+            
+        Returns:
+            Dictionary mapping each found key to its cached value; keys that
+            are missing or expired are omitted
+        """
+        mask = self._mask
+        groups = {}
+        for key in keys:
+            groups.setdefault(hash(key) & mask, []).append(key)
+        
+        found = {}
+        for i, group in groups.items():
+            with self._locks[i]:
+                found.update(self._shards[i].get_many(group))
+        return found
+    
+    def set_many(self, items: Mapping[str, Any], ttl: Optional[int] = None) -> None:
+        """
+        Set several values in cache with the same optional TTL.
+        
+        Items are grouped by shard so each shard's lock is taken once.
+        
+        Args:
+            items: Mapping of cache keys to values
+            ttl: Time-to-live in seconds (uses default_ttl if not specified)
+        """
+        mask = self._mask
+        groups = {}
+        for key, value in items.items():
+            groups.setdefault(hash(key) & mask, {})[key] = value
+        
+        for i, group in groups.items():
+            with self._locks[i]:
+                self._shards[i].set_many(group, ttl)
+    
+    def delete(self, key: str) -> None:
+        """
+        Delete key from cache.
+        
+        Args:
+            key: Cache key to delete
+        """
+        i = hash(key) & self._mask
+        with self._locks[i]:
+            self._shards[i].delete(key)
+    
+    def clear(self) -> None:
+        """Clear all cache entries."""
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                shard.clear()
+    
+    def __len__(self) -> int:
+        """Number of stored entries, including expired ones not yet purged."""
+        total = 0
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                total += len(shard)
+        return total
+    
+    def __contains__(self, key: str) -> bool:
+        """Check if key is cached and unexpired without touching LRU or stats."""
+        i = hash(key) & self._mask
+        with self._locks[i]:
+            return key in self._shards[i]
+    
+    def __getitem__(self, key: str) -> Any:
+        """Get value like get(), raising KeyError if not found or expired."""
+        i = hash(key) & self._mask
+        with self._locks[i]:
+            return self._shards[i][key]
+    
+    def get_stats(self) -> dict:
+        """
+        Get cache statistics aggregated across all shards.
+        
+        Returns:
+            Dictionary with the same keys as CacheManager.get_stats
+        """
+        hits = misses = size = max_size = 0
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                stats = shard.get_stats()
+            hits += stats['hits']
+            misses += stats['misses']
+            size += stats['size']
+            max_size += stats['max_size']
+        total = hits + misses
+        
+        return {
+            'hits': hits,
+            'misses': misses,
+            'total_requests': total,
+            'hit_rate': (hits / total * 100) if total > 0 else 0.0,
+            'hit_rate_bp': (hits * 10000) // total if total > 0 else 0,
+            'size': size,
+            'max_size': max_size
+        }
+
+
 def cached_search(cache_manager: CacheManager) -> Callable:
     """
     Decorator for caching search results.
@@ -133,50 +463,75 @@ def cached_search(cache_manager: CacheManager) -> Callable:
         Decorator function
     """
     def decorator(func: Callable) -> Callable:
-        def wrapper(query: str) -> Any:
+        # Cache methods are bound as defaults so each call uses fast locals
+        @functools.wraps(func)
+        def wrapper(query: str, _get=cache_manager.get,
+                    _set=cache_manager.set, _debug=_log.debug) -> Any:
             # Check cache first
-            cached_result = cache_manager.get(query)
-            if cached_result is not None:
-                print(f"Cache HIT for query: {query}")
-                return cached_result
+            result = _get(query, _MISS)
+            if result is not _MISS:
+                _debug("Cache HIT for query: %s", query)
+                return result
             
             # Cache miss - fetch from source
-            print(f"Cache MISS for query: {query}")
+            _debug("Cache MISS for query: %s", query)
             result = func(query)
             
             # Store in cache
-            cache_manager.set(query, result)
+            _set(query, result)
             return result
         
         return wrapper
     return decorator
 
 
+def no_ttl_cached_search(maxsize: int = 128) -> Callable:
+    """
+    Decorator for caching search results without TTL expiration.
+    
+    Uses the C-implemented functools.lru_cache, which is faster than
+    cached_search when entries never need to expire.
+    
+    Args:
+        maxsize: Maximum number of results to keep
+        
+    Returns:
+        Decorator function
+    """
+    return functools.lru_cache(maxsize=maxsize)
+
+
+# Mock search data, keyed by lowercase region name
+_DUNES = {
+    'sahara': ('Great Sand Sea', 'Erg Chech', 'Grand Erg Oriental'),
+    'arabian': ('Rub al Khali', 'An Nafud', 'Ad Dahna'),
+    'gobi': ('Khongoryn Els', 'Gobi Gurvansaikhan'),
+    'namib': ('Sossusvlei', 'Sandwich Harbour'),
+}
+
+
 # Example: Sand dune search function
-def search_sand_dunes(query: str) -> dict:
+def search_sand_dunes(query: str, latency: Optional[float] = None) -> dict:
     """
     Simulates an expensive search operation.
     
     Args:
         query: Search query
+        latency: Simulated delay in seconds (defaults to DUNE_SEARCH_LATENCY)
         
     Returns:
         Search results
     """
     # Simulate expensive operation
-    time.sleep(0.5)
-    
-    # Mock search results
-    dunes = {
-        'sahara': ['Great Sand Sea', 'Erg Chech', 'Grand Erg Oriental'],
-        'arabian': ['Rub al Khali', 'An Nafud', 'Ad Dahna'],
-        'gobi': ['Khongoryn Els', 'Gobi Gurvansaikhan'],
-        'namib': ['Sossusvlei', 'Sandwich Harbour']
-    }
+    if latency is None:
+        latency = _SIMULATE_LATENCY
+    if latency:
+        time.sleep(latency)
     
+    q = query.lower()
     results = []
-    for region, dune_list in dunes.items():
-        if query.lower() in region.lower():
+    for region, dune_list in _DUNES.items():
+        if q in region:
             results.extend(dune_list)
     
     return {
@@ -189,6 +544,16 @@ def search_sand_dunes(query: str) -> dict:
 
 def main():
     """Main demonstration of cache usage."""
+    # Show cache HIT/MISS messages, which are logged at DEBUG level; only
+    # this module's logger is configured so other libraries stay quiet
+    if not _log.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _log.addHandler(handler)
+    _log.setLevel(logging.DEBUG)
+    # Don't also emit through any handlers configured on the root logger
+    _log.propagate = False
+    
     print("=== Cache Cowboys - Proper Caching Demo ===\n")
     
     # Initialize cache manager
@@ -197,7 +562,7 @@ def main():
     # Create cached version of search function
     @cached_search(cache)
     def cached_dune_search(query: str) -> dict:
-        return search_sand_dunes(query)
+        return search_sand_dunes(query, latency=0.5)
     
     # Demonstrate cache usage
     queries = ['sahara', 'arabian', 'sahara', 'gobi', 'sahara', 'namib']
@@ -211,6 +576,8 @@ def main():
     print("\nCache Statistics:")
     stats = cache.get_stats()
     for key, value in stats.items():
+        if key == 'hit_rate':
+            value = f"{value:.2f}%"
         print(f"  {key}: {value}")
     
     print("\n=== Demo Complete ===")
@@ -3,9 +3,14 @@
 Tests for Cache Cowboys implementation.
 """
 
+import threading
 import time
 import unittest
-from cache_cowboys import CacheManager, cached_search, search_sand_dunes
+from unittest import mock
+from cache_cowboys import (
+    CacheManager, ShardedCacheManager, cached_search, no_ttl_cached_search,
+    search_sand_dunes
+)
 
 
 class TestCacheManager(unittest.TestCase):
@@ -24,6 +29,31 @@ class TestCacheManager(unittest.TestCase):
         """Test getting a key that doesn't exist."""
         self.assertIsNone(self.cache.get('nonexistent'))
     
+    def test_expiry_scans_bounded_under_churn(self):
+        """Test that full expiry scans run at most once per TTL window."""
+        cache = CacheManager(max_size=1000, default_ttl=1)
+        clock = [0]
+        cache._now = lambda: clock[0]
+        
+        with mock.patch.object(CacheManager, '_purge_expired', autospec=True,
+                               side_effect=CacheManager._purge_expired) as purge:
+            # One set and one get per 10ms tick for 10 seconds
+            for i in range(1000):
+                clock[0] = i * 10_000_000
+                cache.set(f'key{i}', i)
+                self.assertEqual(cache.get(f'key{i}'), i)
+                self.assertIsNone(cache.get(f'key{i - 150}'))
+        
+        self.assertLessEqual(purge.call_count, 10)
+    
+    def test_get_default(self):
+        """Test that get returns the given default on a miss."""
+        marker = object()
+        self.assertIs(self.cache.get('nonexistent', marker), marker)
+        
+        self.cache.set('key1', None)
+        self.assertIsNone(self.cache.get('key1', marker))
+    
     def test_ttl_expiration(self):
         """Test that items expire after TTL."""
         self.cache.set('key1', 'value1', ttl=1)
@@ -33,6 +63,29 @@ class TestCacheManager(unittest.TestCase):
         time.sleep(1.1)
         self.assertIsNone(self.cache.get('key1'))
     
+    def test_default_ttl_change(self):
+        """Test that changing default_ttl applies to later sets."""
+        cache = CacheManager(max_size=5, default_ttl=300)
+        clock = [0]
+        cache._now = lambda: clock[0]
+        
+        cache.default_ttl = 1
+        self.assertEqual(cache.default_ttl, 1)
+        cache.set('key1', 'value1')
+        
+        clock[0] = 1_100_000_000
+        self.assertIsNone(cache.get('key1'))
+    
+    def test_expired_entries_purged(self):
+        """Test that expired entries are removed once any lookup sees them."""
+        self.cache.set('key1', 'value1', ttl=1)
+        self.cache.set('key2', 'value2', ttl=60)
+        
+        # Wait for key1 to expire, then look up a different key
+        time.sleep(1.1)
+        self.assertEqual(self.cache.get('key2'), 'value2')
+        self.assertEqual(self.cache.get_stats()['size'], 1)
+    
     def test_lru_eviction(self):
         """Test that LRU eviction works when cache is full."""
         # Fill cache to capacity
@@ -62,6 +115,33 @@ class TestCacheManager(unittest.TestCase):
         self.assertEqual(self.cache.get('key0'), 'value0')
         self.assertIsNone(self.cache.get('key1'))
     
+    def test_get_many_and_set_many(self):
+        """Test batched lookups and inserts."""
+        self.cache.set_many({'key1': 'value1', 'key2': 'value2'})
+        
+        result = self.cache.get_many(['key1', 'key2', 'key3'])
+        self.assertEqual(result, {'key1': 'value1', 'key2': 'value2'})
+        
+        stats = self.cache.get_stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+    
+    def test_container_protocol(self):
+        """Test len(), in and [] on the cache."""
+        self.cache.set('key1', 'value1')
+        
+        self.assertEqual(len(self.cache), 1)
+        self.assertIn('key1', self.cache)
+        self.assertNotIn('key2', self.cache)
+        self.assertEqual(self.cache['key1'], 'value1')
+        with self.assertRaises(KeyError):
+            self.cache['key2']
+        
+        # Membership checks don't count towards statistics
+        stats = self.cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+    
     def test_delete(self):
         """Test deleting cache entries."""
         self.cache.set('key1', 'value1')
@@ -78,6 +158,33 @@ class TestCacheManager(unittest.TestCase):
         self.assertIsNone(self.cache.get('key2'))
         self.assertEqual(self.cache.get_stats()['size'], 0)
     
+    def test_entry_reuse(self):
+        """Test that entry lists are updated in place and recycled."""
+        self.cache.set('key1', 'value1')
+        entry = self.cache._cache['key1']
+        
+        # Updating an existing key mutates its entry in place
+        self.cache.set('key1', 'value2')
+        self.assertIs(self.cache._cache['key1'], entry)
+        
+        # A deleted entry drops its value and is reused by the next insert
+        self.cache.delete('key1')
+        self.assertIsNone(entry[0])
+        self.cache.set('key2', 'value2')
+        self.assertIs(self.cache._cache['key2'], entry)
+        
+        # An evicted entry is handed straight to the new key
+        for i in range(3, 7):
+            self.cache.set(f'key{i}', f'value{i}')
+        self.cache.set('key7', 'value7')
+        self.assertIs(self.cache._cache['key7'], entry)
+        self.assertEqual(self.cache.get('key7'), 'value7')
+        
+        # Clearing releases entries back to the pool
+        self.cache.clear()
+        self.assertIsNone(entry[0])
+        self.assertIn(entry, self.cache._free_entries)
+    
     def test_stats_tracking(self):
         """Test that cache statistics are tracked correctly."""
         self.cache.set('key1', 'value1')
@@ -91,6 +198,8 @@ class TestCacheManager(unittest.TestCase):
         self.assertEqual(stats['hits'], 2)
         self.assertEqual(stats['misses'], 1)
         self.assertEqual(stats['total_requests'], 3)
+        self.assertAlmostEqual(stats['hit_rate'], 200 / 3)
+        self.assertEqual(stats['hit_rate_bp'], 6666)
         self.assertEqual(stats['size'], 1)
     
     def test_update_existing_key(self):
@@ -103,6 +212,98 @@ class TestCacheManager(unittest.TestCase):
         self.assertEqual(self.cache.get_stats()['size'], 1)
 
 
+class TestShardedCacheManager(unittest.TestCase):
+    """Test cases for ShardedCacheManager class."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.cache = ShardedCacheManager(max_size=64, default_ttl=60, shards=4)
+    
+    def test_set_and_get(self):
+        """Test basic set, get and delete across shards."""
+        for i in range(10):
+            self.cache.set(f'key{i}', f'value{i}')
+        for i in range(10):
+            self.assertEqual(self.cache.get(f'key{i}'), f'value{i}')
+        
+        self.cache.delete('key0')
+        self.assertIsNone(self.cache.get('key0'))
+    
+    def test_get_many_and_set_many(self):
+        """Test batched lookups and inserts across shards."""
+        items = {f'key{i}': f'value{i}' for i in range(10)}
+        self.cache.set_many(items)
+        
+        result = self.cache.get_many(list(items) + ['missing'])
+        self.assertEqual(result, items)
+        
+        stats = self.cache.get_stats()
+        self.assertEqual(stats['hits'], 10)
+        self.assertEqual(stats['misses'], 1)
+    
+    def test_container_protocol(self):
+        """Test len(), in and [] on the sharded cache."""
+        for i in range(10):
+            self.cache.set(f'key{i}', f'value{i}')
+        
+        self.assertEqual(len(self.cache), 10)
+        self.assertIn('key3', self.cache)
+        self.assertNotIn('missing', self.cache)
+        self.assertEqual(self.cache['key3'], 'value3')
+        with self.assertRaises(KeyError):
+            self.cache['missing']
+    
+    def test_stats_aggregated(self):
+        """Test that statistics are summed across shards."""
+        self.cache.set('key1', 'value1')
+        self.cache.get('key1')  # hit
+        self.cache.get('key2')  # miss
+        
+        stats = self.cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['max_size'], 64)
+    
+    def test_invalid_shard_count(self):
+        """Test that a non power of two shard count is rejected."""
+        with self.assertRaises(ValueError):
+            ShardedCacheManager(shards=3)
+    
+    def test_uneven_capacity_split(self):
+        """Test that total capacity matches max_size when it isn't divisible."""
+        cache = ShardedCacheManager(max_size=100, shards=16)
+        self.assertEqual(cache.get_stats()['max_size'], 100)
+    
+    def test_max_size_smaller_than_shards(self):
+        """Test that max_size below the shard count is rejected."""
+        with self.assertRaises(ValueError):
+            ShardedCacheManager(max_size=4, shards=16)
+    
+    def test_concurrent_access(self):
+        """Test concurrent set/get from several threads."""
+        cache = ShardedCacheManager(max_size=256, default_ttl=60, shards=4)
+        mismatches = []
+        
+        def worker(n):
+            for i in range(200):
+                key = f'thread{n}-key{i % 10}'
+                cache.set(key, (n, i))
+                if cache.get(key) != (n, i):
+                    mismatches.append(key)
+        
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(mismatches, [])
+        stats = cache.get_stats()
+        self.assertEqual(stats['hits'], 800)
+        self.assertEqual(stats['size'], 40)
+
+
 class TestCachedSearch(unittest.TestCase):
     """Test cases for cached search functionality."""
     
@@ -136,6 +337,40 @@ class TestCachedSearch(unittest.TestCase):
         result3 = cached_func('other')
         self.assertEqual(self.call_count, 2)
         self.assertEqual(result3, 'result for other')
+    
+    def test_cached_search_preserves_metadata(self):
+        """Test that the wrapper keeps the decorated function's metadata."""
+        def search(query: str) -> str:
+            return query
+        
+        cached_func = cached_search(self.cache)(search)
+        self.assertIs(cached_func.__wrapped__, search)
+        self.assertEqual(cached_func.__module__, __name__)
+        self.assertEqual(cached_func.__name__, 'search')
+    
+    def test_cached_search_caches_none(self):
+        """Test that a None result is cached rather than recomputed."""
+        @cached_search(self.cache)
+        def cached_func(query: str) -> None:
+            self.call_count += 1
+            return None
+        
+        self.assertIsNone(cached_func('test'))
+        self.assertIsNone(cached_func('test'))
+        self.assertEqual(self.call_count, 1)
+    
+    def test_no_ttl_cached_search_decorator(self):
+        """Test that the no_ttl_cached_search decorator caches results."""
+        @no_ttl_cached_search(maxsize=2)
+        def cached_func(query: str) -> str:
+            return self.mock_expensive_operation(query)
+        
+        self.assertEqual(cached_func('test'), 'result for test')
+        self.assertEqual(cached_func('test'), 'result for test')
+        self.assertEqual(self.call_count, 1)
+        
+        cached_func('other')
+        self.assertEqual(self.call_count, 2)
 
 
 class TestSandDuneSearch(unittest.TestCase):